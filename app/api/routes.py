@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import asyncio
+import hashlib
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
+from typing import Optional
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
 from app.models.database import get_db, User
 from app.models.schemas import (
     UserCreate,
@@ -15,6 +20,7 @@ from app.models.schemas import (
     PortfolioHoldingCreate,
     PortfolioHoldingResponse,
     PortfolioSummary,
+    PortfolioHoldingsPage,
 )
 from app.services.auth_service import (
     create_user,
@@ -22,11 +28,28 @@ from app.services.auth_service import (
     create_access_token,
     get_current_user,
 )
-from app.services.fmp_service import fmp_service
-from app.services.openai_service import openai_service
-from app.services.portfolio_service import portfolio_service
+from app.services.fmp_service import FMPService, get_fmp_service
+from app.services.openai_service import OpenAIService, get_openai_service
+from app.services.portfolio_service import PortfolioService, get_portfolio_service
+
+# Browser/CDN cache lifetimes (seconds) for stale-tolerant read endpoints
+STOCK_DETAIL_MAX_AGE = 60
+STOCK_SEARCH_MAX_AGE = 600
+
+
+async def _noop():
+    """Placeholder awaitable for optional steps in an asyncio.gather."""
+    return None
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches an ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip() for tag in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
 
-settings = get_settings()
 
 # ============== Page Routes ==============
 page_router = APIRouter(tags=["Pages"])
@@ -79,7 +102,7 @@ async def auth_page():
 
 
 @auth_router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Register a new user.
     
@@ -87,14 +110,15 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     - **username**: Unique username
     - **password**: User's password
     """
-    user = create_user(db, user_data)
+    user = await create_user(db, user_data)
     return user
 
 
 @auth_router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    settings: Settings = Depends(get_settings),
 ):
     """
     Login and receive JWT access token.
@@ -102,7 +126,7 @@ async def login(
     - **username**: User's email address (OAuth2 spec uses 'username' field)
     - **password**: User's password
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     
     if not user:
         raise HTTPException(
@@ -114,6 +138,7 @@ async def login(
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": str(user.id)},
+        settings=settings,
         expires_delta=access_token_expires,
     )
     
@@ -152,9 +177,11 @@ async def dashboard_home(current_user: User = Depends(get_current_user)):
 
 @dashboard_router.get("/stocks/search", response_model=list[StockSearchResult])
 async def search_stocks(
+    response: Response,
     query: str = Query(..., min_length=1, description="Stock ticker or company name"),
     limit: int = Query(10, ge=1, le=50, description="Maximum results to return"),
     current_user: User = Depends(get_current_user),
+    fmp_service: FMPService = Depends(get_fmp_service),
 ):
     """
     Search for stocks by ticker symbol or company name.
@@ -165,14 +192,18 @@ async def search_stocks(
     - **limit**: Maximum number of results (default: 10)
     """
     results = await fmp_service.search_stocks(query, limit)
+    response.headers["Cache-Control"] = f"private, max-age={STOCK_SEARCH_MAX_AGE}"
     return results
 
 
 @dashboard_router.get("/stocks/{symbol}", response_model=StockDetail)
 async def get_stock_details(
     symbol: str,
+    request: Request,
     include_ai_analysis: bool = Query(True, description="Include AI sentiment and valuation analysis"),
     current_user: User = Depends(get_current_user),
+    fmp_service: FMPService = Depends(get_fmp_service),
+    openai_service: OpenAIService = Depends(get_openai_service),
 ):
     """
     Get comprehensive stock details including:
@@ -187,54 +218,69 @@ async def get_stock_details(
     """
     symbol = symbol.upper()
     
-    # Get company profile
-    profile = await fmp_service.get_company_profile(symbol)
+    # The ETag changes every max-age window, so clients revalidating within the
+    # same window get a 304 without touching FMP or OpenAI
+    time_bucket = int(time.time() // STOCK_DETAIL_MAX_AGE)
+    etag_source = f"{symbol}:{include_ai_analysis}:{time_bucket}"
+    cache_headers = {
+        "ETag": f'W/"{hashlib.md5(etag_source.encode()).hexdigest()}"',
+        "Cache-Control": f"private, max-age={STOCK_DETAIL_MAX_AGE}",
+    }
+    if _etag_matches(request, cache_headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    
+    # Fetch the cached market data bundle and (optionally) news concurrently
+    bundle, news = await asyncio.gather(
+        fmp_service.get_stock_bundle(symbol, days=30),
+        fmp_service.get_stock_news(symbol, limit=10) if include_ai_analysis else _noop(),
+    )
+    profile, quote, multiples = bundle.profile, bundle.quote, bundle.price_multiples
+    
     if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Stock symbol '{symbol}' not found",
         )
     
-    # Get current quote
-    quote = await fmp_service.get_stock_quote(symbol)
     current_price = quote.get("price", 0) if quote else 0
     
-    # Get price history (30 days)
-    price_history = await fmp_service.get_price_history(symbol, days=30)
-    
-    # Get price multiples
-    multiples = await fmp_service.get_key_metrics(symbol)
-    
     # Initialize optional AI analysis
     news_sentiment = None
     ai_valuation = None
     
     if include_ai_analysis:
-        # Get news and analyze sentiment
-        news = await fmp_service.get_stock_news(symbol, limit=10)
-        news_sentiment = await openai_service.analyze_news_sentiment(
-            symbol=symbol,
-            company_name=profile.get("companyName", symbol),
-            headlines=news,
-        )
-        
-        # Generate AI valuation summary
-        ai_valuation = await openai_service.generate_valuation_summary(
-            symbol=symbol,
-            company_name=profile.get("companyName", symbol),
-            current_price=current_price,
-            multiples=multiples,
+        # Analyze news sentiment and generate the valuation summary concurrently
+        news_sentiment, ai_valuation = await asyncio.gather(
+            openai_service.analyze_news_sentiment(
+                symbol=symbol,
+                company_name=profile.get("companyName", symbol),
+                headlines=news,
+            ),
+            openai_service.generate_valuation_summary(
+                symbol=symbol,
+                company_name=profile.get("companyName", symbol),
+                current_price=current_price,
+                multiples=multiples,
+            ),
         )
     
-    return StockDetail(
+    stock_detail = StockDetail(
         symbol=symbol,
         company_name=profile.get("companyName", symbol),
         current_price=current_price,
-        price_history=price_history,
+        price_history=bundle.price_history,
         price_multiples=multiples,
         news_sentiment=news_sentiment,
         ai_valuation=ai_valuation,
     )
+    
+    # Serialize the already-validated model straight to JSON bytes instead of
+    # having FastAPI re-validate and re-encode it through response_model
+    return Response(
+        content=stock_detail.model_dump_json(),
+        media_type="application/json",
+        headers=cache_headers,
+    )
 
 
 # ============== Portfolio Routes ==============
@@ -243,8 +289,10 @@ portfolio_router = APIRouter(prefix="/dashboard/portfolio", tags=["Portfolio"])
 
 @portfolio_router.get("", response_model=PortfolioSummary)
 async def get_portfolio(
+    include_holdings: bool = Query(True, description="Include individual holdings"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ):
     """
     Get user's portfolio summary with all holdings.
@@ -253,16 +301,44 @@ async def get_portfolio(
     - Total invested amount
     - Current portfolio value
     - Total gain/loss
-    - All individual holdings with current prices
+    - All individual holdings with current prices (unless include_holdings=false)
+    
+    - **include_holdings**: Whether to include individual holdings (default: True)
     """
-    return await portfolio_service.get_portfolio_summary(db, current_user)
+    return await portfolio_service.get_portfolio_summary(db, current_user, include_holdings)
+
+
+@portfolio_router.get("/holdings", response_model=PortfolioHoldingsPage)
+async def list_holdings(
+    cursor: Optional[int] = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200, description="Maximum holdings to return"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+):
+    """
+    Get portfolio holdings one page at a time.
+    
+    Pass the returned **next_cursor** to fetch the following page; it is null
+    on the last page.
+    
+    - **cursor**: Cursor from the previous page (omit for the first page)
+    - **limit**: Maximum number of holdings per page (default: 50)
+    """
+    return await portfolio_service.get_holdings_page(db, current_user, cursor, limit)
 
 
 @portfolio_router.post("/holdings", response_model=PortfolioHoldingResponse, status_code=status.HTTP_201_CREATED)
 async def add_holding(
     holding_data: PortfolioHoldingCreate,
+    defer_company_name: bool = Query(
+        False,
+        description="Save immediately and look up the company name in the background",
+    ),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    fmp_service: FMPService = Depends(get_fmp_service),
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ):
     """
     Add a new stock holding to portfolio.
@@ -270,11 +346,20 @@ async def add_holding(
     - **symbol**: Stock ticker symbol
     - **shares**: Number of whole shares to "buy"
     - **purchase_price**: Price per share at purchase
+    - **defer_company_name**: Skip waiting on the company profile lookup; the
+      symbol isn't validated and the company name is filled in shortly after
     """
-    holding = await portfolio_service.add_holding(db, current_user, holding_data)
-    
-    # Get current price for response
-    quote = await fmp_service.get_stock_quote(holding.symbol)
+    # Fetch the current price for the response while the holding is saved
+    quote_task = asyncio.ensure_future(fmp_service.get_stock_quote(holding_data.symbol.upper()))
+    try:
+        holding = await portfolio_service.add_holding(
+            db, current_user, holding_data, defer_company_name
+        )
+    except BaseException:
+        quote_task.cancel()
+        raise
+
+    quote = await quote_task
     current_price = quote.get("price", holding.purchase_price) if quote else holding.purchase_price
     
     total_value = current_price * holding.shares
@@ -299,14 +384,15 @@ async def add_holding(
 async def remove_holding(
     holding_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ):
     """
     Remove a holding from portfolio (sell all shares).
     
     - **holding_id**: ID of the holding to remove
     """
-    portfolio_service.remove_holding(db, current_user, holding_id)
+    await portfolio_service.remove_holding(db, current_user, holding_id)
     return None
 
 
@@ -315,7 +401,9 @@ async def update_holding(
     holding_id: int,
     shares: int = Query(..., gt=0, description="New number of shares"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    fmp_service: FMPService = Depends(get_fmp_service),
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
 ):
     """
     Update the number of shares in a holding.
@@ -323,7 +411,7 @@ async def update_holding(
     - **holding_id**: ID of the holding to update
     - **shares**: New number of whole shares
     """
-    holding = portfolio_service.update_holding(db, current_user, holding_id, shares)
+    holding = await portfolio_service.update_holding(db, current_user, holding_id, shares)
     
     # Get current price for response
     quote = await fmp_service.get_stock_quote(holding.symbol)
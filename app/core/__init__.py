@@ -1,3 +1,14 @@
 from app.core.config import Settings, get_settings
+from app.core.cache import Cache, MemoryCache, RedisCache, cached, create_cache
+from app.core.batching import AsyncBatcher
 
-__all__ = ["Settings", "get_settings"]
+__all__ = [
+    "Settings",
+    "get_settings",
+    "Cache",
+    "MemoryCache",
+    "RedisCache",
+    "cached",
+    "create_cache",
+    "AsyncBatcher",
+]
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import timedelta
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class AsyncBatcher(Generic[T, R]):
+    """
+    Group items submitted by concurrent callers into batches.
+
+    A batch is flushed once `max_batch_size` items are queued or `max_wait`
+    has passed since the first queued item, whichever comes first. Each caller
+    gets back the result for its own item.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[list[T]], Awaitable[list[R]]],
+        max_batch_size: int = 8,
+        max_wait: timedelta = timedelta(milliseconds=50),
+    ):
+        """
+        Args:
+            process_batch: Coroutine returning one result per item, in order
+            max_batch_size: Flush as soon as this many items are queued
+            max_wait: Longest time the first queued item waits for a flush
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: list[tuple[T, asyncio.Future]] = []
+        self._flush_timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, item: T) -> R:
+        """Queue an item and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.max_wait.total_seconds(), self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Hand the queued items to a background task as one batch."""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._run(batch))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[T, asyncio.Future]]) -> None:
+        try:
+            results = await self.process_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError("process_batch must return one result per item")
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        except BaseException:
+            # Cancelled (e.g. at shutdown); don't leave callers waiting forever
+            for _, future in batch:
+                if not future.done():
+                    future.cancel()
+            raise
+
+        for (_, future), result in zip(batch, results):
+            # Callers that were cancelled while waiting already have a done future
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,218 @@
+import asyncio
+import functools
+import inspect
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Callable, Optional, get_type_hints
+
+from pydantic import TypeAdapter
+
+from app.core.config import Settings
+
+
+class Cache(ABC):
+    """Base class for async key/value caches with per-entry TTL."""
+
+    backend = "base"
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for a key, or None on a miss."""
+        value = await self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: timedelta) -> None:
+        """Store a value under a key for the given TTL."""
+        await self._set(key, value, ttl)
+
+    async def get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        """Return the cached values for several keys, None for each miss."""
+        values = await self._get_many(keys)
+        misses = values.count(None)
+        self.misses += misses
+        self.hits += len(values) - misses
+        return values
+
+    async def set_many(self, items: dict[str, bytes], ttl: timedelta) -> None:
+        """Store several values with the same TTL."""
+        await self._set_many(items, ttl)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring."""
+        return {"backend": self.backend, "hits": self.hits, "misses": self.misses}
+
+    async def close(self) -> None:
+        """Release any resources held by the cache."""
+
+    @abstractmethod
+    async def _get(self, key: str) -> Optional[bytes]:
+        """Backend lookup for a single key."""
+
+    @abstractmethod
+    async def _set(self, key: str, value: bytes, ttl: timedelta) -> None:
+        """Backend store for a single key."""
+
+    async def _get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        return [await self._get(key) for key in keys]
+
+    async def _set_many(self, items: dict[str, bytes], ttl: timedelta) -> None:
+        for key, value in items.items():
+            await self._set(key, value, ttl)
+
+
+class MemoryCache(Cache):
+    """
+    In-process TTL cache backed by an insertion-ordered dict.
+
+    When full, the least recently written entry is evicted in O(1). Expired
+    entries are dropped when read, plus in a full sweep at most once per
+    `sweep_interval`, so inserts don't scan the whole store.
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = 10_000, sweep_interval: timedelta = timedelta(minutes=1)):
+        super().__init__()
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._store: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._next_sweep = time.monotonic() + sweep_interval.total_seconds()
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        entry = self._store.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._store.pop(key, None)
+            return None
+
+        return value
+
+    async def _set(self, key: str, value: bytes, ttl: timedelta) -> None:
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+        if key in self._store:
+            self._store.move_to_end(key)
+        elif len(self._store) >= self.max_entries:
+            self._store.popitem(last=False)
+        self._store[key] = (now + ttl.total_seconds(), value)
+
+    def _sweep(self, now: float) -> None:
+        """Drop every expired entry."""
+        expired = [key for key, (expires_at, _) in self._store.items() if expires_at <= now]
+        for key in expired:
+            del self._store[key]
+        self._next_sweep = now + self.sweep_interval.total_seconds()
+
+
+class RedisCache(Cache):
+    """Shared TTL cache backed by Redis."""
+
+    backend = "redis"
+
+    def __init__(self, url: str):
+        super().__init__()
+        from redis import asyncio as aioredis
+
+        self._redis = aioredis.from_url(url)
+
+    async def _get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(key)
+
+    async def _set(self, key: str, value: bytes, ttl: timedelta) -> None:
+        await self._redis.set(key, value, px=int(ttl.total_seconds() * 1000))
+
+    async def _get_many(self, keys: list[str]) -> list[Optional[bytes]]:
+        if not keys:
+            return []
+        return await self._redis.mget(keys)
+
+    async def _set_many(self, items: dict[str, bytes], ttl: timedelta) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(key, value, px=int(ttl.total_seconds() * 1000))
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def create_cache(settings: Settings) -> Cache:
+    """Create the cache backend selected by the settings."""
+    if settings.redis_url:
+        return RedisCache(settings.redis_url)
+    return MemoryCache()
+
+
+def cached(ttl: timedelta, key: Optional[Callable[..., str]] = None) -> Callable:
+    """
+    Cache the result of an async service method.
+
+    The decorated method's owner must expose a `cache` attribute and an
+    `_inflight` dict. Results are keyed on the method name and its arguments
+    and serialized to JSON using the method's return annotation. Concurrent
+    calls for the same key share a single in-flight lookup, so a cold key is
+    fetched once no matter how many callers ask for it. None results are not
+    cached. The wrapper's `cache_key(*args, **kwargs)` returns the key used
+    for a call, for code that reads or fills the same entries in bulk.
+
+    Args:
+        ttl: How long a cached result stays valid
+        key: Optional builder called with the method's arguments (minus self)
+            to produce the key suffix, for arguments that don't stringify well
+    """
+    def decorator(func: Callable) -> Callable:
+        adapter = TypeAdapter(get_type_hints(func)["return"])
+        signature = inspect.signature(func)
+
+        def build_key(*args: Any, **kwargs: Any) -> str:
+            bound = signature.bind(None, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = {name: value for name, value in bound.arguments.items() if name != "self"}
+            if key is None:
+                suffix = ":".join(str(value) for value in arguments.values())
+            else:
+                suffix = key(**arguments)
+            return f"{func.__qualname__}:{suffix}"
+
+        @functools.wraps(func)
+        async def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            cache_key = build_key(*args, **kwargs)
+
+            async def load() -> Any:
+                payload = await self.cache.get(cache_key)
+                if payload is not None:
+                    return adapter.validate_json(payload)
+
+                result = await func(self, *args, **kwargs)
+                if result is not None:
+                    await self.cache.set(cache_key, adapter.dump_json(result), ttl)
+
+                return result
+
+            inflight = self._inflight.get(cache_key)
+            if inflight is None:
+                inflight = asyncio.ensure_future(load())
+                self._inflight[cache_key] = inflight
+                inflight.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+
+            # Shield so one caller being cancelled doesn't cancel the shared fetch
+            return await asyncio.shield(inflight)
+
+        wrapper.cache_key = build_key
+        return wrapper
+
+    return decorator
@@ -9,13 +9,23 @@ class Settings(BaseSettings):
     app_name: str = "InvestoMommy"
     debug: bool = False
     
+    # CORS (JSON list in the environment, e.g. CORS_ORIGINS='["https://app.example.com"]')
+    cors_origins: list[str] = ["http://localhost:3000"]
+    
     # API Keys
     fmp_api_key: str = ""
     openai_api_key: str = ""
     
+    # FMP client limits
+    fmp_max_concurrency: int = 10
+    fmp_max_retries: int = 3
+    
     # Database
     database_url: str = "sqlite:///./investomommy.db"
     
+    # Cache (in-process memory cache unless a Redis URL is set)
+    redis_url: str = ""
+    
     # JWT Settings
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
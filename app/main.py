@@ -1,13 +1,16 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from typing import Optional
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.core.config import get_settings
-from app.models.database import create_tables
+from app.core.cache import create_cache
+from app.core.config import Settings, get_settings
+from app.models.database import create_db_engine, create_session_factory, create_tables
 from app.api.routes import page_router, auth_router, dashboard_router, portfolio_router
-from app.services.fmp_service import fmp_service
-
-settings = get_settings()
+from app.services.fmp_service import FMPService
+from app.services.openai_service import OpenAIService
+from app.services.portfolio_service import PortfolioService
 
 
 @asynccontextmanager
@@ -15,21 +18,60 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager for startup and shutdown events."""
     # Startup
     print("Starting InvestoMommy API...")
-    create_tables()
+    settings = app.state.settings
+    app.state.engine = create_db_engine(settings)
+    app.state.session_factory = create_session_factory(app.state.engine)
+    await create_tables(app.state.engine)
     print("Database tables created.")
     
+    # Create the shared cache and service clients on the running event loop
+    app.state.cache = create_cache(settings)
+    app.state.fmp_service = FMPService(settings, app.state.cache)
+    app.state.openai_service = OpenAIService(settings, app.state.cache)
+    app.state.portfolio_service = PortfolioService(app.state.fmp_service, app.state.session_factory)
+    
     yield
     
     # Shutdown
     print("Shutting down InvestoMommy API...")
-    await fmp_service.close()
+    await app.state.portfolio_service.close()
+    await app.state.fmp_service.close()
+    await app.state.openai_service.close()
+    await app.state.cache.close()
+    await app.state.engine.dispose()
     print("Cleanup complete.")
 
 
-# Create FastAPI application
-app = FastAPI(
-    title="InvestoMommy API",
-    description="""
+# Health check endpoint
+async def health_check(request: Request, settings: Settings = Depends(get_settings)):
+    """Health check endpoint for monitoring."""
+    return {
+        "status": "healthy",
+        "app": settings.app_name,
+        "cache": request.app.state.cache.stats(),
+    }
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Create the FastAPI application.
+    
+    Settings are read when the app is created rather than at import, so tests
+    can pass their own. `app.main:app` builds one with the default settings.
+    
+    Args:
+        settings: Settings to use instead of the environment-derived defaults
+        
+    Returns:
+        Configured FastAPI application
+    """
+    if settings is None:
+        settings = get_settings()
+
+    # Create FastAPI application
+    app = FastAPI(
+        title="InvestoMommy API",
+        description="""
     InvestoMommy - Your Personal Investment Companion
     
     ## Features
@@ -46,28 +88,37 @@ app = FastAPI(
     2. Login at `/auth/login` to receive your access token
     3. Include the token in the Authorization header: `Bearer <token>`
     """,
-    version="1.0.0",
-    lifespan=lifespan,
-)
+        version="1.0.0",
+        lifespan=lifespan,
+    )
+    app.state.settings = settings
+    # Routes that depend on get_settings see the same settings as the app
+    app.dependency_overrides[get_settings] = lambda: settings
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    # Configure CORS for the known frontend origins only.
+    # Any further middleware should be written as a pure ASGI callable rather than
+    # BaseHTTPMiddleware, which adds an extra task and stream wrapper per request.
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "PATCH", "DELETE"],
+        allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+    )
 
-# Include routers
-app.include_router(page_router)
-app.include_router(auth_router)
-app.include_router(dashboard_router)
-app.include_router(portfolio_router)
+    # Include routers
+    app.include_router(page_router)
+    app.include_router(auth_router)
+    app.include_router(dashboard_router)
+    app.include_router(portfolio_router)
+    app.add_api_route("/health", health_check, methods=["GET"], tags=["Health"])
 
+    return app
 
-# Health check endpoint
-@app.get("/health", tags=["Health"])
-async def health_check():
-    """Health check endpoint for monitoring."""
-    return {"status": "healthy", "app": settings.app_name}
+
+def __getattr__(name: str):
+    """Build the default `app` on first access, for `uvicorn app.main:app`."""
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
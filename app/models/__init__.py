@@ -1,4 +1,11 @@
-from app.models.database import User, PortfolioHolding, get_db, create_tables
+from app.models.database import (
+    User,
+    PortfolioHolding,
+    get_db,
+    create_db_engine,
+    create_session_factory,
+    create_tables,
+)
 from app.models.schemas import (
     UserCreate,
     UserLogin,
@@ -7,6 +14,7 @@ from app.models.schemas import (
     StockSearchResult,
     PricePoint,
     PriceMultiples,
+    StockBundle,
     NewsHeadline,
     NewsSentiment,
     AIValuationSummary,
@@ -14,12 +22,15 @@ from app.models.schemas import (
     PortfolioHoldingCreate,
     PortfolioHoldingResponse,
     PortfolioSummary,
+    PortfolioHoldingsPage,
 )
 
 __all__ = [
     "User",
     "PortfolioHolding",
     "get_db",
+    "create_db_engine",
+    "create_session_factory",
     "create_tables",
     "UserCreate",
     "UserLogin",
@@ -28,6 +39,7 @@ __all__ = [
     "StockSearchResult",
     "PricePoint",
     "PriceMultiples",
+    "StockBundle",
     "NewsHeadline",
     "NewsSentiment",
     "AIValuationSummary",
@@ -35,4 +47,5 @@ __all__ = [
     "PortfolioHoldingCreate",
     "PortfolioHoldingResponse",
     "PortfolioSummary",
+    "PortfolioHoldingsPage",
 ]
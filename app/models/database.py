@@ -1,18 +1,53 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import relationship
 from datetime import datetime
+from fastapi import Request
 
-from app.core.config import get_settings
+from app.core.config import Settings
 
-settings = get_settings()
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+# Asyncio driver for each database URL scheme given without one
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def _async_database_url(url: str) -> str:
+    """
+    Point a database URL at an asyncio driver.
+    
+    Args:
+        url: Database URL, either with an explicit driver (`scheme+driver://`)
+            or with a scheme from ASYNC_DRIVERS
+        
+    Returns:
+        URL using an asyncio driver
+    """
+    scheme, separator, rest = url.partition("://")
+    if not separator or "+" in scheme:
+        return url
+    if scheme not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"No asyncio driver known for database URL scheme {scheme!r}; "
+            f"set DATABASE_URL as '{scheme}+<async driver>://...'"
+        )
+    return f"{ASYNC_DRIVERS[scheme]}://{rest}"
+
+
+def create_db_engine(settings: Settings) -> AsyncEngine:
+    """Create the database engine for the configured database URL."""
+    return create_async_engine(_async_database_url(settings.database_url))
+
+
+def create_session_factory(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    """Create the session factory bound to an engine."""
+    # Objects stay usable after commit without an implicit (blocking) refresh
+    return async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
@@ -34,6 +69,10 @@ class User(Base):
 class PortfolioHolding(Base):
     """Portfolio holding model for tracking fake investments."""
     __tablename__ = "portfolio_holdings"
+    __table_args__ = (
+        # Every holdings query filters by user, and some also by symbol
+        Index("ix_holdings_user_symbol", "user_id", "symbol"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -47,15 +86,21 @@ class PortfolioHolding(Base):
     user = relationship("User", back_populates="holdings")
 
 
-def create_tables():
+def _create_schema(conn) -> None:
+    """Create missing tables, plus indexes added to tables that already exist."""
+    Base.metadata.create_all(conn)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def create_tables(engine: AsyncEngine):
     """Create all database tables."""
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(_create_schema)
 
 
-def get_db():
+async def get_db(request: Request):
     """Dependency to get database session."""
-    db = SessionLocal()
-    try:
+    async with request.app.state.session_factory() as db:
         yield db
-    finally:
-        db.close()
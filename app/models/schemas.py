@@ -36,12 +36,15 @@ class Token(BaseModel):
 
 # ============== Stock Schemas ==============
 class StockSearchResult(BaseModel):
-    """Schema for stock search results."""
-    symbol: str
-    name: str
-    exchange: Optional[str] = None
-    exchange_short_name: Optional[str] = None
-    stock_type: Optional[str] = None
+    """Schema for stock search results (validates from FMP's camelCase keys)."""
+    symbol: str = ""
+    name: str = ""
+    exchange: Optional[str] = Field(None, validation_alias="exchangeFullName")
+    exchange_short_name: Optional[str] = Field(None, validation_alias="exchangeShortName")
+    stock_type: Optional[str] = Field(None, validation_alias="type")
+
+    class Config:
+        populate_by_name = True
 
 
 class PricePoint(BaseModel):
@@ -55,19 +58,33 @@ class PricePoint(BaseModel):
 
 
 class PriceMultiples(BaseModel):
-    """Schema for price multiple ratios."""
-    pe_ratio: Optional[float] = Field(None, description="Price to Earnings Ratio")
-    pb_ratio: Optional[float] = Field(None, description="Price to Book Ratio")
-    ps_ratio: Optional[float] = Field(None, description="Price to Sales Ratio")
-    ev_ebitda: Optional[float] = Field(None, description="Enterprise Value to EBITDA")
+    """Schema for price multiple ratios (validates from FMP's TTM key metrics)."""
+    pe_ratio: Optional[float] = Field(None, description="Price to Earnings Ratio", validation_alias="peRatioTTM")
+    pb_ratio: Optional[float] = Field(None, description="Price to Book Ratio", validation_alias="pbRatioTTM")
+    ps_ratio: Optional[float] = Field(None, description="Price to Sales Ratio", validation_alias="priceToSalesRatioTTM")
+    ev_ebitda: Optional[float] = Field(None, description="Enterprise Value to EBITDA", validation_alias="enterpriseValueOverEBITDATTM")
+
+    class Config:
+        populate_by_name = True
+
+
+class StockBundle(BaseModel):
+    """Schema for the market data behind a stock detail page."""
+    profile: Optional[dict] = None
+    quote: Optional[dict] = None
+    price_history: list[PricePoint]
+    price_multiples: PriceMultiples
 
 
 class NewsHeadline(BaseModel):
-    """Schema for news headline."""
-    title: str
-    url: str
-    published_date: str
-    source: Optional[str] = None
+    """Schema for news headline (validates from FMP's camelCase keys)."""
+    title: str = ""
+    url: str = ""
+    published_date: str = Field("", validation_alias="publishedDate")
+    source: Optional[str] = Field(None, validation_alias="site")
+
+    class Config:
+        populate_by_name = True
 
 
 class NewsSentiment(BaseModel):
@@ -128,3 +145,9 @@ class PortfolioSummary(BaseModel):
     total_gain_loss: float
     total_gain_loss_percent: float
     holdings: list[PortfolioHoldingResponse]
+
+
+class PortfolioHoldingsPage(BaseModel):
+    """Schema for one page of portfolio holdings."""
+    holdings: list[PortfolioHoldingResponse]
+    next_cursor: Optional[int] = None
@@ -1,22 +1,22 @@
-from app.services.fmp_service import fmp_service, FMPService
-from app.services.openai_service import openai_service, OpenAIService
+from app.services.fmp_service import get_fmp_service, FMPService
+from app.services.openai_service import get_openai_service, OpenAIService
 from app.services.auth_service import (
     get_current_user,
     create_user,
     authenticate_user,
     create_access_token,
 )
-from app.services.portfolio_service import portfolio_service, PortfolioService
+from app.services.portfolio_service import get_portfolio_service, PortfolioService
 
 __all__ = [
-    "fmp_service",
+    "get_fmp_service",
     "FMPService",
-    "openai_service",
+    "get_openai_service",
     "OpenAIService",
     "get_current_user",
     "create_user",
     "authenticate_user",
     "create_access_token",
-    "portfolio_service",
+    "get_portfolio_service",
     "PortfolioService",
 ]
@@ -1,26 +1,102 @@
+import asyncio
+import functools
 import httpx
+import orjson
+from fastapi import Request
+from pydantic import TypeAdapter
 from datetime import datetime, timedelta
 from typing import Optional
 
-from app.core.config import get_settings
+from app.core.batching import AsyncBatcher
+from app.core.cache import Cache, cached
+from app.core.config import Settings
 from app.models.schemas import (
     StockSearchResult,
     PricePoint,
     PriceMultiples,
+    StockBundle,
     NewsHeadline,
 )
 
-settings = get_settings()
-
 FMP_BASE_URL = "https://financialmodelingprep.com/api/v3"
 
+# Rate-limit and gateway errors worth retrying with backoff
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Quotes go stale quickly, so they get the shortest cache lifetime
+QUOTE_CACHE_TTL = timedelta(seconds=60)
+
+# Quote lookups from concurrent callers are merged into one request of up to
+# this many symbols, waiting at most this long for others to join
+QUOTE_BATCH_MAX_SIZE = 50
+QUOTE_BATCH_MAX_WAIT = timedelta(milliseconds=20)
+
+# Validates a whole list of rows in one pass instead of one constructor call per row
+_SEARCH_ADAPTER = TypeAdapter(list[StockSearchResult])
+_PRICE_ADAPTER = TypeAdapter(list[PricePoint])
+_NEWS_ADAPTER = TypeAdapter(list[NewsHeadline])
+
 
 class FMPService:
     """Service for interacting with Financial Modeling Prep API."""
 
-    def __init__(self):
+    def __init__(self, settings: Settings, cache: Cache):
         self.api_key = settings.fmp_api_key
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # HTTP/2 multiplexes concurrent FMP calls over a pooled keep-alive connection.
+        # Limits are set on the transport since the client ignores them once a
+        # transport is given; transport retries only cover connection failures.
+        self.client = httpx.AsyncClient(
+            base_url=FMP_BASE_URL,
+            # Every FMP endpoint takes the key as a query parameter
+            params={"apikey": self.api_key},
+            timeout=httpx.Timeout(connect=5.0, read=20.0, write=10.0, pool=5.0),
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=200,
+                    max_keepalive_connections=100,
+                    keepalive_expiry=60,
+                ),
+                retries=2,
+            ),
+        )
+        self.cache = cache
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._semaphore = asyncio.Semaphore(settings.fmp_max_concurrency)
+        self.max_retries = settings.fmp_max_retries
+        # Quote requests from concurrent users share one batch quote call
+        self._quote_batcher = AsyncBatcher(
+            self._fetch_quote_batch,
+            max_batch_size=QUOTE_BATCH_MAX_SIZE,
+            max_wait=QUOTE_BATCH_MAX_WAIT,
+        )
+
+    async def _get(self, path: str, params: Optional[dict] = None) -> httpx.Response:
+        """
+        Send a GET request to FMP.
+        
+        Requests are bounded by the configured concurrency limit, and
+        rate-limit/gateway errors are retried with exponential backoff.
+        
+        Args:
+            path: Endpoint path relative to the FMP base URL
+            params: Query parameters besides the API key
+            
+        Returns:
+            Successful HTTP response
+        """
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                response = await self.client.get(path, params=params)
+
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                break
+
+            # Back off outside the semaphore so waiting doesn't hold a slot
+            await asyncio.sleep(min(0.2 * 2 ** attempt, 5.0))
+
+        response.raise_for_status()
+        return response
 
     async def search_stocks(self, query: str, limit: int = 10) -> list[StockSearchResult]:
         """
@@ -33,28 +109,18 @@ class FMPService:
         Returns:
             List of matching stocks
         """
-        url = f"{FMP_BASE_URL}/search"
+        path = "/search"
         params = {
             "query": query,
             "limit": limit,
-            "apikey": self.api_key,
         }
 
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        return [
-            StockSearchResult(
-                symbol=item.get("symbol", ""),
-                name=item.get("name", ""),
-                exchange=item.get("exchangeFullName"),
-                exchange_short_name=item.get("exchangeShortName"),
-                stock_type=item.get("type"),
-            )
-            for item in data
-        ]
+        response = await self._get(path, params)
+        data = orjson.loads(response.content)
 
+        return _SEARCH_ADAPTER.validate_python(data)
+
+    @cached(ttl=QUOTE_CACHE_TTL)
     async def get_stock_quote(self, symbol: str) -> Optional[dict]:
         """
         Get current stock quote.
@@ -65,15 +131,101 @@ class FMPService:
         Returns:
             Stock quote data or None
         """
-        url = f"{FMP_BASE_URL}/quote/{symbol}"
-        params = {"apikey": self.api_key}
+        return await self._quote_batcher.submit(symbol)
 
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+    async def get_stock_quotes(self, symbols: list[str]) -> dict[str, dict]:
+        """
+        Get current quotes for several stocks in a single request.
+        
+        Quotes are cached per symbol under the same keys as get_stock_quote,
+        so only symbols without a fresh cached quote are requested from FMP.
+        Symbols already being fetched by another caller (batch or single) are
+        awaited rather than requested again.
+        
+        Args:
+            symbols: Stock ticker symbols
+            
+        Returns:
+            Stock quote data keyed by symbol (unknown symbols are omitted)
+        """
+        if not symbols:
+            return {}
 
-        return data[0] if data else None
+        cache_keys = [self.get_stock_quote.cache_key(symbol) for symbol in symbols]
+        cached_quotes = await self.cache.get_many(cache_keys)
+
+        quotes = {}
+        pending = {}
+        to_fetch = []
+        loop = asyncio.get_running_loop()
+        for symbol, key, payload in zip(symbols, cache_keys, cached_quotes):
+            if payload is not None:
+                quotes[symbol] = orjson.loads(payload)
+                continue
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                inflight = loop.create_future()
+                self._inflight[key] = inflight
+                inflight.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+                to_fetch.append(symbol)
+            pending[symbol] = inflight
+
+        if to_fetch:
+            # Run the request as its own task so a cancelled caller doesn't
+            # strand other callers waiting on these symbols
+            fetch_task = asyncio.ensure_future(self._submit_quotes(to_fetch))
+            fetch_task.add_done_callback(
+                functools.partial(self._resolve_quotes, {symbol: pending[symbol] for symbol in to_fetch})
+            )
+
+        # Shield so one caller being cancelled doesn't cancel the shared fetch
+        results = await asyncio.gather(*(asyncio.shield(future) for future in pending.values()))
+        quotes.update(
+            {symbol: quote for symbol, quote in zip(pending, results) if quote is not None}
+        )
+
+        return quotes
+
+    async def _submit_quotes(self, symbols: list[str]) -> dict[str, dict]:
+        """Queue symbols on the shared quote batcher and collect their quotes."""
+        results = await asyncio.gather(*(self._quote_batcher.submit(symbol) for symbol in symbols))
+        return {symbol: quote for symbol, quote in zip(symbols, results) if quote is not None}
+
+    async def _fetch_quote_batch(self, symbols: list[str]) -> list[Optional[dict]]:
+        """Fetch one batcher flush worth of quotes, in submission order."""
+        fetched = await self._fetch_quotes(list(dict.fromkeys(symbols)))
+        return [fetched.get(symbol) for symbol in symbols]
+
+    async def _fetch_quotes(self, symbols: list[str]) -> dict[str, dict]:
+        """Request quotes from FMP and cache each one under its symbol's key."""
+        path = f"/quote/{','.join(symbols)}"
+        response = await self._get(path)
+        data = orjson.loads(response.content)
 
+        fetched = {item["symbol"]: item for item in data}
+        await self.cache.set_many(
+            {
+                self.get_stock_quote.cache_key(symbol): orjson.dumps(quote)
+                for symbol, quote in fetched.items()
+            },
+            QUOTE_CACHE_TTL,
+        )
+
+        return fetched
+
+    @staticmethod
+    def _resolve_quotes(futures: dict[str, asyncio.Future], fetch_task: asyncio.Task) -> None:
+        """Settle each symbol's in-flight future from a finished quote request."""
+        for symbol, future in futures.items():
+            if fetch_task.cancelled():
+                future.cancel()
+            elif fetch_task.exception() is not None:
+                future.set_exception(fetch_task.exception())
+            else:
+                future.set_result(fetch_task.result().get(symbol))
+
+    @cached(ttl=timedelta(hours=12))
     async def get_price_history(
         self, symbol: str, days: int = 30
     ) -> list[PricePoint]:
@@ -87,7 +239,7 @@ class FMPService:
         Returns:
             List of price points
         """
-        url = f"{FMP_BASE_URL}/historical-price-full/{symbol}"
+        path = f"/historical-price-full/{symbol}"
         
         # Calculate date range
         end_date = datetime.now()
@@ -96,27 +248,14 @@ class FMPService:
         params = {
             "from": start_date.strftime("%Y-%m-%d"),
             "to": end_date.strftime("%Y-%m-%d"),
-            "apikey": self.api_key,
         }
 
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        response = await self._get(path, params)
+        data = orjson.loads(response.content)
 
-        historical = data.get("historical", [])
-        
-        return [
-            PricePoint(
-                date=item["date"],
-                open=item["open"],
-                high=item["high"],
-                low=item["low"],
-                close=item["close"],
-                volume=item["volume"],
-            )
-            for item in historical
-        ]
+        return _PRICE_ADAPTER.validate_python(data.get("historical", []))
 
+    @cached(ttl=timedelta(hours=1))
     async def get_key_metrics(self, symbol: str) -> PriceMultiples:
         """
         Get key financial metrics (price multiples).
@@ -128,25 +267,16 @@ class FMPService:
             Price multiples data
         """
         # Get ratios from key-metrics-ttm endpoint
-        url = f"{FMP_BASE_URL}/key-metrics-ttm/{symbol}"
-        params = {"apikey": self.api_key}
-
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        path = f"/key-metrics-ttm/{symbol}"
+        response = await self._get(path)
+        data = orjson.loads(response.content)
 
         if not data:
             return PriceMultiples()
 
-        metrics = data[0]
-        
-        return PriceMultiples(
-            pe_ratio=metrics.get("peRatioTTM"),
-            pb_ratio=metrics.get("pbRatioTTM"),
-            ps_ratio=metrics.get("priceToSalesRatioTTM"),
-            ev_ebitda=metrics.get("enterpriseValueOverEBITDATTM"),
-        )
+        return PriceMultiples.model_validate(data[0])
 
+    @cached(ttl=timedelta(hours=24))
     async def get_company_profile(self, symbol: str) -> Optional[dict]:
         """
         Get company profile information.
@@ -157,15 +287,26 @@ class FMPService:
         Returns:
             Company profile data or None
         """
-        url = f"{FMP_BASE_URL}/profile/{symbol}"
-        params = {"apikey": self.api_key}
-
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        path = f"/profile/{symbol}"
+        response = await self._get(path)
+        data = orjson.loads(response.content)
 
         return data[0] if data else None
 
+    async def peek_company_profile(self, symbol: str) -> Optional[dict]:
+        """
+        Get a company profile only if it is already cached.
+        
+        Args:
+            symbol: Stock ticker symbol
+            
+        Returns:
+            Cached company profile data, or None without calling FMP
+        """
+        payload = await self.cache.get(self.get_company_profile.cache_key(symbol))
+        return orjson.loads(payload) if payload is not None else None
+
+    @cached(ttl=timedelta(minutes=10))
     async def get_stock_news(self, symbol: str, limit: int = 10) -> list[NewsHeadline]:
         """
         Get recent news for a stock.
@@ -177,31 +318,61 @@ class FMPService:
         Returns:
             List of news headlines
         """
-        url = f"{FMP_BASE_URL}/stock_news"
+        path = "/stock_news"
         params = {
             "tickers": symbol,
             "limit": limit,
-            "apikey": self.api_key,
         }
 
-        response = await self.client.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-
-        return [
-            NewsHeadline(
-                title=item.get("title", ""),
-                url=item.get("url", ""),
-                published_date=item.get("publishedDate", ""),
-                source=item.get("site"),
-            )
-            for item in data
-        ]
+        response = await self._get(path, params)
+        data = orjson.loads(response.content)
+
+        return _NEWS_ADAPTER.validate_python(data)
+
+    async def get_stock_bundle(self, symbol: str, days: int = 30) -> StockBundle:
+        """
+        Get profile, quote, price history and multiples for a stock.
+        
+        The slow-moving data is read from one cached entry, and the quote from
+        its own cache, so the price is never older than QUOTE_CACHE_TTL.
+        
+        Args:
+            symbol: Stock ticker symbol
+            days: Number of days of price history (default 30)
+            
+        Returns:
+            Stock market data bundle
+        """
+        (profile, price_history, price_multiples), quote = await asyncio.gather(
+            self._get_stock_fundamentals(symbol, days),
+            self.get_stock_quote(symbol),
+        )
+
+        return StockBundle(
+            profile=profile,
+            quote=quote,
+            price_history=price_history,
+            price_multiples=price_multiples,
+        )
+
+    @cached(ttl=timedelta(seconds=60))
+    async def _get_stock_fundamentals(
+        self, symbol: str, days: int = 30
+    ) -> tuple[Optional[dict], list[PricePoint], PriceMultiples]:
+        """Get profile, price history and multiples concurrently, cached under one key."""
+        profile, price_history, price_multiples = await asyncio.gather(
+            self.get_company_profile(symbol),
+            self.get_price_history(symbol, days=days),
+            self.get_key_metrics(symbol),
+        )
+
+        return profile, price_history, price_multiples
 
     async def close(self):
         """Close the HTTP client."""
         await self.client.aclose()
 
 
-# Singleton instance
-fmp_service = FMPService()
+def get_fmp_service(request: Request) -> FMPService:
+    """Dependency to get the application's FMP service."""
+    return request.app.state.fmp_service
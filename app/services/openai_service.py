@@ -1,8 +1,14 @@
+from fastapi import Request
 from openai import AsyncOpenAI
+from datetime import timedelta
 from typing import Optional
+import asyncio
+import hashlib
 import json
 
-from app.core.config import get_settings
+from app.core.batching import AsyncBatcher
+from app.core.cache import Cache, cached
+from app.core.config import Settings
 from app.models.schemas import (
     NewsHeadline,
     NewsSentiment,
@@ -10,19 +16,64 @@ from app.models.schemas import (
     AIValuationSummary,
 )
 
-settings = get_settings()
+# Headline limits for the sentiment prompt; fewer input tokens mean faster, cheaper calls
+MAX_PROMPT_HEADLINES = 8
+MAX_HEADLINE_CHARS = 140
+
+
+def _sentiment_cache_key(symbol: str, company_name: str, headlines: list[NewsHeadline]) -> str:
+    """Key sentiment results on the headlines themselves, not on time."""
+    headlines_json = json.dumps([h.model_dump() for h in headlines], sort_keys=True)
+    return f"{symbol}:{hashlib.sha1(headlines_json.encode()).hexdigest()}"
+
+
+def _valuation_cache_key(
+    symbol: str, company_name: str, current_price: float, multiples: PriceMultiples
+) -> str:
+    """Key valuation results on the price and multiples they were generated from."""
+    multiples_hash = hashlib.sha1(multiples.model_dump_json().encode()).hexdigest()
+    return f"{symbol}:{current_price:.2f}:{multiples_hash}"
+
+
+def _parse_sentiment(item: object) -> Optional[dict]:
+    """Return a sentiment result if it has every expected field, or None if not."""
+    if not isinstance(item, dict):
+        return None
+
+    try:
+        score = float(item["sentiment_score"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    label = item.get("sentiment_label")
+    summary = item.get("analysis_summary")
+    if not -1.0 <= score <= 1.0 or not isinstance(label, str) or not isinstance(summary, str):
+        return None
+
+    return {"sentiment_score": score, "sentiment_label": label, "analysis_summary": summary}
 
 
 class OpenAIService:
     """Service for OpenAI LLM-powered analysis."""
 
-    def __init__(self):
+    def __init__(self, settings: Settings, cache: Cache):
         self.client = AsyncOpenAI(api_key=settings.openai_api_key)
-        self.model = "gpt-4o"
+        # Sentiment scoring is a small structured task; keep the larger model for valuation
+        self.sentiment_model = "gpt-4o-mini"
+        self.valuation_model = "gpt-4o"
+        self.cache = cache
+        self._inflight: dict[str, asyncio.Future] = {}
+        # Sentiment requests from concurrent users share one OpenAI call
+        self._sentiment_batcher = AsyncBatcher(
+            self._score_sentiment_batch,
+            max_batch_size=8,
+            max_wait=timedelta(milliseconds=50),
+        )
 
+    @cached(ttl=timedelta(minutes=15), key=_sentiment_cache_key)
     async def analyze_news_sentiment(
         self, symbol: str, company_name: str, headlines: list[NewsHeadline]
-    ) -> NewsSentiment:
+    ) -> Optional[NewsSentiment]:
         """
         Analyze news sentiment using OpenAI.
         
@@ -32,9 +83,18 @@ class OpenAIService:
             headlines: List of news headlines to analyze
             
         Returns:
-            News sentiment analysis
+            News sentiment analysis, or None if the model's reply was unusable
         """
-        if not headlines:
+        # Drop the same story syndicated across sources
+        unique_headlines = []
+        seen_titles = set()
+        for headline in headlines:
+            normalized_title = headline.title.lower().strip()
+            if normalized_title and normalized_title not in seen_titles:
+                seen_titles.add(normalized_title)
+                unique_headlines.append(headline)
+
+        if not unique_headlines:
             return NewsSentiment(
                 overall_sentiment_score=0.0,
                 sentiment_label="Neutral",
@@ -42,13 +102,43 @@ class OpenAIService:
                 analysis_summary="No recent news available for analysis.",
             )
 
-        # Prepare headlines for analysis
+        # Prepare headlines for analysis (titles only, trimmed, to keep the prompt short)
         headlines_text = "\n".join(
-            [f"- {h.title} (Source: {h.source}, Date: {h.published_date})" 
-             for h in headlines[:10]]
+            [f"- {h.title.strip()[:MAX_HEADLINE_CHARS]}"
+             for h in unique_headlines[:MAX_PROMPT_HEADLINES]]
+        )
+
+        result = await self._sentiment_batcher.submit((symbol, company_name, headlines_text))
+        if result is None:
+            # Leave sentiment out rather than show (and cache) a made-up verdict
+            return None
+
+        return NewsSentiment(
+            overall_sentiment_score=result["sentiment_score"],
+            sentiment_label=result["sentiment_label"],
+            top_headlines=unique_headlines[:5],  # Return top 5 headlines
+            analysis_summary=result["analysis_summary"],
         )
 
-        prompt = f"""Analyze the following news headlines for {company_name} ({symbol}) and provide:
+    async def _score_sentiment_batch(
+        self, requests: list[tuple[str, str, str]]
+    ) -> list[Optional[dict]]:
+        """
+        Score news sentiment for one or more stocks in a single OpenAI call.
+        
+        Stocks that a batched reply leaves out or garbles are retried once
+        with a single-company call.
+        
+        Args:
+            requests: (symbol, company_name, headlines_text) for each stock
+            
+        Returns:
+            Sentiment result per request, in the same order; None where no
+            usable reply was received for that stock
+        """
+        if len(requests) == 1:
+            symbol, company_name, headlines_text = requests[0]
+            prompt = f"""Analyze the following news headlines for {company_name} ({symbol}) and provide:
 1. An overall sentiment score from -1.0 (very bearish) to 1.0 (very bullish)
 2. A sentiment label: "Bullish", "Bearish", or "Neutral"
 3. A brief summary of the overall news sentiment (2-3 sentences)
@@ -62,9 +152,32 @@ Respond in JSON format:
     "sentiment_label": "<string>",
     "analysis_summary": "<string>"
 }}"""
+        else:
+            companies_text = "\n\n".join(
+                f"{company_name} ({symbol}):\n{headlines_text}"
+                for symbol, company_name, headlines_text in requests
+            )
+            prompt = f"""Analyze the news headlines for each of the following companies and provide, for each one:
+1. An overall sentiment score from -1.0 (very bearish) to 1.0 (very bullish)
+2. A sentiment label: "Bullish", "Bearish", or "Neutral"
+3. A brief summary of the overall news sentiment (2-3 sentences)
+
+{companies_text}
+
+Respond in JSON format with one entry per ticker:
+{{
+    "results": [
+        {{
+            "ticker": "<string>",
+            "sentiment_score": <float>,
+            "sentiment_label": "<string>",
+            "analysis_summary": "<string>"
+        }}
+    ]
+}}"""
 
         response = await self.client.chat.completions.create(
-            model=self.model,
+            model=self.sentiment_model,
             messages=[
                 {
                     "role": "system",
@@ -74,17 +187,40 @@ Respond in JSON format:
             ],
             response_format={"type": "json_object"},
             temperature=0.3,
+            max_tokens=200 * len(requests),
         )
 
-        result = json.loads(response.choices[0].message.content)
+        try:
+            result = json.loads(response.choices[0].message.content)
+        except (TypeError, json.JSONDecodeError):
+            result = None
 
-        return NewsSentiment(
-            overall_sentiment_score=float(result.get("sentiment_score", 0.0)),
-            sentiment_label=result.get("sentiment_label", "Neutral"),
-            top_headlines=headlines[:5],  # Return top 5 headlines
-            analysis_summary=result.get("analysis_summary", ""),
-        )
+        if len(requests) == 1:
+            return [_parse_sentiment(result)]
+
+        # A bad entry only fails its own ticker, not the rest of the batch
+        items = result.get("results") if isinstance(result, dict) else None
+        results_by_ticker = {
+            str(item.get("ticker", "")).upper(): _parse_sentiment(item)
+            for item in (items if isinstance(items, list) else [])
+            if isinstance(item, dict)
+        }
+        results = [results_by_ticker.get(symbol.upper()) for symbol, _, _ in requests]
 
+        retry = [index for index, result in enumerate(results) if result is None]
+        if retry:
+            retried = await asyncio.gather(
+                *(self._score_sentiment_batch([requests[index]]) for index in retry),
+                return_exceptions=True,
+            )
+            for index, single in zip(retry, retried):
+                # A failed retry only leaves its own stock without a result
+                if isinstance(single, list):
+                    results[index] = single[0]
+
+        return results
+
+    @cached(ttl=timedelta(hours=1), key=_valuation_cache_key)
     async def generate_valuation_summary(
         self,
         symbol: str,
@@ -133,7 +269,7 @@ Respond in JSON format:
 }}"""
 
         response = await self.client.chat.completions.create(
-            model=self.model,
+            model=self.valuation_model,
             messages=[
                 {
                     "role": "system",
@@ -143,6 +279,7 @@ Respond in JSON format:
             ],
             response_format={"type": "json_object"},
             temperature=0.4,
+            max_tokens=500,
         )
 
         result = json.loads(response.choices[0].message.content)
@@ -153,6 +290,11 @@ Respond in JSON format:
             key_insights=result.get("key_insights", []),
         )
 
+    async def close(self):
+        """Close the OpenAI client."""
+        await self.client.close()
+
 
-# Singleton instance
-openai_service = OpenAIService()
+def get_openai_service(request: Request) -> OpenAIService:
+    """Dependency to get the application's OpenAI service."""
+    return request.app.state.openai_service
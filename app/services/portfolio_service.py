@@ -1,23 +1,42 @@
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, status
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import Row, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from fastapi import HTTPException, Request, status
 
 from app.models.database import User, PortfolioHolding
 from app.models.schemas import (
     PortfolioHoldingCreate,
     PortfolioHoldingResponse,
     PortfolioSummary,
+    PortfolioHoldingsPage,
 )
-from app.services.fmp_service import fmp_service
+from app.services.fmp_service import FMPService
+
+logger = logging.getLogger(__name__)
+
+# Symbols per batch quote request, keeping request URLs short
+QUOTE_BATCH_SIZE = 50
+# Upper bound on how long a portfolio render waits for any quote batch
+QUOTE_TIMEOUT_SECONDS = 20
 
 
 class PortfolioService:
     """Service for managing user portfolios."""
 
+    def __init__(self, fmp_service: FMPService, session_factory: async_sessionmaker[AsyncSession]):
+        self.fmp_service = fmp_service
+        self.session_factory = session_factory
+        self._tasks: set[asyncio.Task] = set()
+
     async def add_holding(
         self,
-        db: Session,
+        db: AsyncSession,
         user: User,
         holding_data: PortfolioHoldingCreate,
+        defer_company_name: bool = False,
     ) -> PortfolioHolding:
         """
         Add a new holding to user's portfolio.
@@ -26,37 +45,78 @@ class PortfolioService:
             db: Database session
             user: Current user
             holding_data: Holding data (symbol, shares, purchase_price)
+            defer_company_name: If the company profile isn't cached, save the
+                holding under its symbol right away and fill in the company
+                name in the background instead of waiting on FMP. The symbol
+                is not validated in that case.
             
         Returns:
             Created portfolio holding
         """
-        # Get company info from FMP
-        profile = await fmp_service.get_company_profile(holding_data.symbol)
-        
-        if not profile:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Stock symbol '{holding_data.symbol}' not found",
-            )
+        symbol = holding_data.symbol.upper()
+
+        # Get company info, from the cache alone when deferring
+        if defer_company_name:
+            profile = await self.fmp_service.peek_company_profile(symbol)
+        else:
+            profile = await self.fmp_service.get_company_profile(symbol)
+            if not profile:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Stock symbol '{holding_data.symbol}' not found",
+                )
 
-        company_name = profile.get("companyName", holding_data.symbol)
+        company_name = profile.get("companyName", symbol) if profile else symbol
 
-        # Create holding
+        # Create holding; the write transaction only starts once the profile is in hand
         holding = PortfolioHolding(
             user_id=user.id,
-            symbol=holding_data.symbol.upper(),
+            symbol=symbol,
             company_name=company_name,
             shares=holding_data.shares,
             purchase_price=holding_data.purchase_price,
         )
 
         db.add(holding)
-        db.commit()
-        db.refresh(holding)
+        await db.commit()
+        await db.refresh(holding)
+
+        if not profile:
+            task = asyncio.create_task(self._fill_company_name(holding.id, symbol))
+            # Keep a reference so the task isn't garbage collected mid-flight
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
 
         return holding
 
-    async def get_holdings(self, db: Session, user: User) -> list[PortfolioHoldingResponse]:
+    async def _fill_company_name(self, holding_id: int, symbol: str) -> None:
+        """
+        Look up a holding's company name and store it.
+        
+        Runs after the request that created the holding has finished, so it
+        uses its own database session.
+        
+        Args:
+            holding_id: ID of the holding to update
+            symbol: Stock ticker symbol
+        """
+        try:
+            profile = await self.fmp_service.get_company_profile(symbol)
+            if not profile or "companyName" not in profile:
+                return
+
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(PortfolioHolding)
+                    .where(PortfolioHolding.id == holding_id)
+                    .values(company_name=profile["companyName"])
+                )
+                await db.commit()
+        except Exception:
+            # Nothing awaits this task, so record the failure with its traceback
+            logger.exception("Could not fill company name for holding %s (%s)", holding_id, symbol)
+
+    async def get_holdings(self, db: AsyncSession, user: User) -> list[PortfolioHoldingResponse]:
         """
         Get all holdings for a user with current prices.
         
@@ -67,57 +127,240 @@ class PortfolioService:
         Returns:
             List of portfolio holdings with current values
         """
-        holdings = db.query(PortfolioHolding).filter(
+        return [response async for response, _, _ in self._iter_holding_rows(db, user)]
+
+    async def get_holdings_page(
+        self,
+        db: AsyncSession,
+        user: User,
+        cursor: Optional[int] = None,
+        limit: int = 50,
+    ) -> PortfolioHoldingsPage:
+        """
+        Get one page of a user's holdings with current prices.
+        
+        Pages are keyed on holding ID, so only the requested rows are loaded
+        and priced no matter how large the portfolio is.
+        
+        Args:
+            db: Database session
+            user: Current user
+            cursor: Return holdings after this ID (None for the first page)
+            limit: Maximum number of holdings to return
+            
+        Returns:
+            Page of holdings, with the cursor for the next page if there is one
+        """
+        # Load one row past the page to tell whether another page follows
+        rows = await self._load_holding_rows(db, user, after_id=cursor, limit=limit + 1)
+        has_more = len(rows) > limit
+
+        holdings = [response async for response, _, _ in self._price_holding_rows(rows[:limit])]
+        next_cursor = holdings[-1].id if has_more else None
+
+        return PortfolioHoldingsPage.model_construct(holdings=holdings, next_cursor=next_cursor)
+
+    async def _iter_holding_rows(
+        self, db: AsyncSession, user: User
+    ) -> AsyncIterator[tuple[PortfolioHoldingResponse, float, float]]:
+        """
+        Yield each of a user's holdings priced at its current quote.
+        
+        Args:
+            db: Database session
+            user: Current user
+            
+        Yields:
+            Tuple of (holding response, invested amount, current total value)
+        """
+        rows = await self._load_holding_rows(db, user)
+        async for item in self._price_holding_rows(rows):
+            yield item
+
+    async def _load_holding_rows(
+        self,
+        db: AsyncSession,
+        user: User,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> list[Row]:
+        """
+        Load a user's holdings as plain column rows, in ID order.
+        
+        Args:
+            db: Database session
+            user: Current user
+            after_id: Only include holdings with a greater ID
+            limit: Maximum number of holdings to include
+            
+        Returns:
+            Holding rows
+        """
+        # Plain column rows are enough here; skip ORM object hydration
+        stmt = select(
+            PortfolioHolding.id,
+            PortfolioHolding.symbol,
+            PortfolioHolding.company_name,
+            PortfolioHolding.shares,
+            PortfolioHolding.purchase_price,
+            PortfolioHolding.purchased_at,
+        ).where(
             PortfolioHolding.user_id == user.id
-        ).all()
+        ).order_by(PortfolioHolding.id)
+        if after_id is not None:
+            stmt = stmt.where(PortfolioHolding.id > after_id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
 
-        result = []
-        for holding in holdings:
-            # Get current price
-            quote = await fmp_service.get_stock_quote(holding.symbol)
-            current_price = quote.get("price", holding.purchase_price) if quote else holding.purchase_price
+        result = await db.execute(stmt)
+        return list(result.all())
 
-            total_value = current_price * holding.shares
-            invested = holding.purchase_price * holding.shares
+    async def _price_holding_rows(
+        self, holdings: list[Row]
+    ) -> AsyncIterator[tuple[PortfolioHoldingResponse, float, float]]:
+        """
+        Yield each holding row priced at its current quote.
+        
+        Args:
+            holdings: Rows from _load_holding_rows
+            
+        Yields:
+            Tuple of (holding response, invested amount, current total value)
+        """
+        # Several lots of the same symbol share one quote
+        quotes = await self._get_quotes(list(dict.fromkeys(holding.symbol for holding in holdings)))
+
+        # Unpack each row once instead of repeating attribute lookups
+        for holding_id, symbol, company_name, shares, purchase_price, purchased_at in holdings:
+            quote = quotes.get(symbol)
+            current_price = quote.get("price", purchase_price) if quote else purchase_price
+
+            total_value = current_price * shares
+            invested = purchase_price * shares
             gain_loss = total_value - invested
             gain_loss_percent = (gain_loss / invested * 100) if invested > 0 else 0
 
-            result.append(
-                PortfolioHoldingResponse(
-                    id=holding.id,
-                    symbol=holding.symbol,
-                    company_name=holding.company_name,
-                    shares=holding.shares,
-                    purchase_price=holding.purchase_price,
-                    current_price=current_price,
-                    total_value=total_value,
-                    gain_loss=gain_loss,
-                    gain_loss_percent=gain_loss_percent,
-                    purchased_at=holding.purchased_at,
-                )
+            # Every field is a DB column or a float computed above, so skip validation
+            response = PortfolioHoldingResponse.model_construct(
+                id=holding_id,
+                symbol=symbol,
+                company_name=company_name,
+                shares=shares,
+                purchase_price=purchase_price,
+                current_price=current_price,
+                total_value=total_value,
+                gain_loss=gain_loss,
+                gain_loss_percent=gain_loss_percent,
+                purchased_at=purchased_at,
             )
 
-        return result
+            # Invested and total value ride along so summaries don't recompute them
+            yield response, invested, total_value
+
+    async def _get_quotes(self, symbols: list[str]) -> dict[str, dict]:
+        """
+        Get current quotes for a list of symbols.
+        
+        Symbols are requested in batches that are fetched concurrently. A batch
+        that fails or times out is left out, so its holdings fall back to their
+        purchase price instead of failing the whole portfolio.
+        
+        Args:
+            symbols: Stock ticker symbols
+            
+        Returns:
+            Stock quote data keyed by symbol
+        """
+        batches = [
+            symbols[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(symbols), QUOTE_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *(
+                asyncio.wait_for(self.fmp_service.get_stock_quotes(batch), timeout=QUOTE_TIMEOUT_SECONDS)
+                for batch in batches
+            ),
+            return_exceptions=True,
+        )
+
+        quotes = {}
+        for result in results:
+            if not isinstance(result, BaseException):
+                quotes.update(result)
+
+        return quotes
 
-    async def get_portfolio_summary(self, db: Session, user: User) -> PortfolioSummary:
+    async def get_portfolio_totals(self, db: AsyncSession, user: User) -> tuple[float, float]:
+        """
+        Get total invested amount and current value without loading holdings.
+        
+        Shares and invested amounts are summed per symbol in a single SQL
+        aggregate, then priced with one batch quote lookup.
+        
+        Args:
+            db: Database session
+            user: Current user
+            
+        Returns:
+            Tuple of (total_invested, current_value)
+        """
+        result = await db.execute(
+            select(
+                PortfolioHolding.symbol,
+                func.sum(PortfolioHolding.shares).label("shares"),
+                func.sum(PortfolioHolding.shares * PortfolioHolding.purchase_price).label("invested"),
+            ).where(
+                PortfolioHolding.user_id == user.id
+            ).group_by(PortfolioHolding.symbol)
+        )
+        rows = result.all()
+
+        quotes = await self._get_quotes([row.symbol for row in rows])
+
+        total_invested = 0.0
+        current_value = 0.0
+        for row in rows:
+            total_invested += row.invested
+            quote = quotes.get(row.symbol)
+            if quote and "price" in quote:
+                current_value += row.shares * quote["price"]
+            else:
+                # Unpriced symbols are valued at cost, as in get_holdings
+                current_value += row.invested
+
+        return total_invested, current_value
+
+    async def get_portfolio_summary(
+        self, db: AsyncSession, user: User, include_holdings: bool = True
+    ) -> PortfolioSummary:
         """
         Get portfolio summary with totals.
         
         Args:
             db: Database session
             user: Current user
+            include_holdings: Whether to include the individual holdings
             
         Returns:
-            Portfolio summary with all holdings
+            Portfolio summary, with all holdings if requested
         """
-        holdings = await self.get_holdings(db, user)
+        if include_holdings:
+            # Accumulate totals while the holdings are built, in a single pass
+            holdings = []
+            total_invested = 0.0
+            current_value = 0.0
+            async for response, invested, total_value in self._iter_holding_rows(db, user):
+                holdings.append(response)
+                total_invested += invested
+                current_value += total_value
+        else:
+            holdings = []
+            total_invested, current_value = await self.get_portfolio_totals(db, user)
 
-        total_invested = sum(h.purchase_price * h.shares for h in holdings)
-        current_value = sum(h.total_value for h in holdings)
         total_gain_loss = current_value - total_invested
         total_gain_loss_percent = (total_gain_loss / total_invested * 100) if total_invested > 0 else 0
 
-        return PortfolioSummary(
+        # Holdings were built with model_construct and the totals are floats
+        return PortfolioSummary.model_construct(
             total_invested=total_invested,
             current_value=current_value,
             total_gain_loss=total_gain_loss,
@@ -125,7 +368,7 @@ class PortfolioService:
             holdings=holdings,
         )
 
-    def remove_holding(self, db: Session, user: User, holding_id: int) -> bool:
+    async def remove_holding(self, db: AsyncSession, user: User, holding_id: int) -> bool:
         """
         Remove a holding from user's portfolio.
         
@@ -137,25 +380,28 @@ class PortfolioService:
         Returns:
             True if removed successfully
         """
-        holding = db.query(PortfolioHolding).filter(
-            PortfolioHolding.id == holding_id,
-            PortfolioHolding.user_id == user.id,
-        ).first()
+        # Delete and check ownership in one statement
+        result = await db.execute(
+            delete(PortfolioHolding).where(
+                PortfolioHolding.id == holding_id,
+                PortfolioHolding.user_id == user.id,
+            ).returning(PortfolioHolding.id)
+        )
+        removed = result.scalar_one_or_none()
 
-        if not holding:
+        if removed is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Holding not found",
             )
 
-        db.delete(holding)
-        db.commit()
+        await db.commit()
 
         return True
 
-    def update_holding(
+    async def update_holding(
         self,
-        db: Session,
+        db: AsyncSession,
         user: User,
         holding_id: int,
         shares: int,
@@ -172,29 +418,37 @@ class PortfolioService:
         Returns:
             Updated portfolio holding
         """
-        holding = db.query(PortfolioHolding).filter(
-            PortfolioHolding.id == holding_id,
-            PortfolioHolding.user_id == user.id,
-        ).first()
-
-        if not holding:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Holding not found",
-            )
-
         if shares <= 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Shares must be greater than 0",
             )
 
-        holding.shares = shares
-        db.commit()
-        db.refresh(holding)
+        # Update and check ownership in one statement
+        result = await db.execute(
+            update(PortfolioHolding).where(
+                PortfolioHolding.id == holding_id,
+                PortfolioHolding.user_id == user.id,
+            ).values(shares=shares).returning(PortfolioHolding)
+        )
+        holding = result.scalar_one_or_none()
+
+        if holding is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Holding not found",
+            )
+
+        await db.commit()
 
         return holding
 
+    async def close(self) -> None:
+        """Wait for outstanding background tasks."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
 
-# Singleton instance
-portfolio_service = PortfolioService()
+def get_portfolio_service(request: Request) -> PortfolioService:
+    """Dependency to get the application's portfolio service."""
+    return request.app.state.portfolio_service